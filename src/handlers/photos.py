@@ -2,20 +2,22 @@
 from __future__ import annotations
 
 import base64
+import binascii
 import html
 import json
 import logging
 import os
+import re
+import secrets
+import time
 import urllib.parse
-import uuid
-from datetime import datetime, timezone
-from email.parser import BytesParser
-from email.policy import default as EMAIL_POLICY
-from http.cookies import SimpleCookie
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import boto3
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 AWS_REGION = (
     os.getenv("AWS_REGION")
@@ -24,23 +26,127 @@ AWS_REGION = (
 )
 
 LOGGER = logging.getLogger()
-LOGGER.setLevel(logging.INFO)
+
+
+def _resolve_log_level(name: str) -> int:
+    level = logging.getLevelNamesMapping().get(name.strip().upper())
+    if level is None:
+        LOGGER.warning("Unknown LOG_LEVEL %r; falling back to INFO", name)
+        return logging.INFO
+    return level
+
+
+LOGGER.setLevel(_resolve_log_level(os.getenv("LOG_LEVEL", "INFO")))
 
 PHOTO_TABLE_NAME = os.environ["PHOTO_TABLE_NAME"]
 PHOTO_BUCKET_NAME = os.environ["PHOTO_BUCKET_NAME"]
 _ALLOWED_IDS_RAW = os.getenv("ALLOWED_FAMILY_IDS", "").strip()
 STAGE_NAME = os.getenv("STAGE_NAME", "").strip()
-ALLOWED_FAMILY_IDS = {
+ALLOWED_FAMILY_IDS = frozenset(
     value.strip()
     for value in _ALLOWED_IDS_RAW.split(",")
     if value.strip()
-}
+)
+
+# Clients are built once per execution environment so warm invocations reuse
+# their pooled keep-alive connections to S3 and DynamoDB.
+_BOTO_SESSION = boto3.session.Session(region_name=AWS_REGION)
+# Worst case per call: 2 attempts x (1 s connect + 3 s read) plus at most
+# 1 s of retry backoff = 9 s. Routes make at most two calls in a row (the
+# form upload), which is why template.yaml sets Timeout to 20 s; the only
+# loop over calls, photo query pagination, stops at the invocation deadline.
+_CALL_WORST_CASE_SECONDS = 9
+_BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    connect_timeout=1,
+    read_timeout=3,
+    retries={"mode": "standard", "total_max_attempts": 2},
+)
+s3_client = _BOTO_SESSION.client("s3", config=_BOTO_CONFIG)
+dynamodb_client = _BOTO_SESSION.client("dynamodb", config=_BOTO_CONFIG)
+
+
+def _warm_clients() -> None:
+    """Open the request clients' first connections during Lambda init.
+
+    The calls go through ``dynamodb_client`` and ``s3_client`` themselves so
+    the TLS connections land in the pools the first request uses. Any
+    connection-level failure stops the warm-up so a degraded network costs
+    at most one call's timeout budget of init time.
+    """
+
+    warm_up_calls = (
+        (dynamodb_client.describe_table, {"TableName": PHOTO_TABLE_NAME}),
+        (s3_client.head_bucket, {"Bucket": PHOTO_BUCKET_NAME}),
+    )
+    for call, kwargs in warm_up_calls:
+        try:
+            call(**kwargs)
+        except ClientError as exc:
+            LOGGER.warning("Client warm-up failed: %s", exc)
+        except BotoCoreError as exc:
+            # Connection or credential trouble will not clear up for the next call.
+            LOGGER.warning("Client warm-up aborted: %s", exc)
+            return
 
-s3_client = boto3.client("s3", region_name=AWS_REGION)
-dynamodb_client = boto3.client("dynamodb", region_name=AWS_REGION)
+
+if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    _warm_clients()
 
 UPLOAD_URL_TTL_SECONDS = 15 * 60  # 15 minutes
 HTML_CONTENT_TYPE = "text/html; charset=utf-8"
+# json.dumps builds a new JSONEncoder whenever options are passed; reuse one.
+_encode_json = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+_HSTS_HEADER_VALUE = "max-age=63072000; includeSubDomains; preload"
+_CONTENT_TYPE_EXTENSIONS = MappingProxyType(
+    {
+        "image/jpeg": ".jpg",
+        "image/png": ".png",
+        "image/gif": ".gif",
+        "image/heic": ".heic",
+        "image/heif": ".heif",
+    }
+)
+PHOTO_BATCH_MAX_ITEMS = 100  # DynamoDB TransactWriteItems limit
+PHOTO_QUERY_PAGE_SIZE = 200
+PHOTO_QUERY_MAX_ITEMS = 1000
+_PHOTO_PROJECTION_NAMES = {
+    "#photo_id": "PhotoId",
+    "#object_key": "ObjectKey",
+    "#title": "Title",
+    "#description": "Description",
+    "#uploaded_at": "UploadedAt",
+    "#content_type": "ContentType",
+}
+_PHOTO_PROJECTION = ", ".join(_PHOTO_PROJECTION_NAMES)
+# Request parameters that never change between invocations.
+_PHOTO_QUERY_KWARGS: Dict[str, Any] = {
+    "TableName": PHOTO_TABLE_NAME,
+    "KeyConditionExpression": "FamilyId = :family_id",
+    "ProjectionExpression": _PHOTO_PROJECTION,
+    "ExpressionAttributeNames": _PHOTO_PROJECTION_NAMES,
+    "ScanIndexForward": False,
+    "PaginationConfig": {
+        "MaxItems": PHOTO_QUERY_MAX_ITEMS,
+        "PageSize": PHOTO_QUERY_PAGE_SIZE,
+    },
+}
+_PUT_PHOTO_KWARGS: Dict[str, Any] = {
+    "TableName": PHOTO_TABLE_NAME,
+    "ConditionExpression": "attribute_not_exists(PhotoId)",
+}
+_CONDITIONAL_CHECK_FAILED = "ConditionalCheckFailedException"
+_OPTIONAL_PHOTO_ATTRIBUTES = (
+    ("title", "Title"),
+    ("description", "Description"),
+    ("uploadedAt", "UploadedAt"),
+    ("contentType", "ContentType"),
+)
+# Monotonic time at which the current invocation times out, set by handler.
+_invocation_deadline: Optional[float] = None
+_MALFORMED_FORM_MESSAGE = "Malformed form data"
+_HEADER_PARAM_RE = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
 
 
 def _build_response(
@@ -53,17 +159,19 @@ def _build_response(
 ) -> Dict[str, Any]:
     """Construct a response object for API Gateway."""
 
-    response_headers = {
-        "Strict-Transport-Security": "max-age=63072000; includeSubDomains; preload",
-    }
-    if headers:
-        response_headers.update(headers)
+    response_headers = None if headers else _SHARED_HEADERS.get(content_type)
+    if response_headers is None:
+        response_headers = {
+            "Strict-Transport-Security": _HSTS_HEADER_VALUE,
+        }
+        if headers:
+            response_headers.update(headers)
 
-    if content_type:
-        response_headers["Content-Type"] = content_type
+        if content_type:
+            response_headers["Content-Type"] = content_type
 
     if content_type == "application/json":
-        body_text = json.dumps(body or {})
+        body_text = _encode_json(body) if body else "{}"
     elif isinstance(body, bytes):
         body_text = base64.b64encode(body).decode("ascii")
     else:
@@ -81,17 +189,37 @@ def _build_response(
     return response
 
 
+# Header dicts for responses without extra headers are shared between
+# responses; nothing mutates a response after it is built.
+_SHARED_HEADERS: Dict[str, Dict[str, str]] = {
+    content_type: {
+        "Strict-Transport-Security": _HSTS_HEADER_VALUE,
+        "Content-Type": content_type,
+    }
+    for content_type in ("application/json", HTML_CONTENT_TYPE, "text/plain")
+}
+
+# Fixed responses are built once at import and returned as-is; callers must not mutate them.
+_HEALTH_OK_RESPONSE = _build_response(200, {"status": "ok"})
+_NOT_FOUND_RESPONSE = _build_response(404, {"message": "Not Found"})
+_PHOTO_NOT_FOUND_RESPONSE = _build_response(404, {"message": "Photo not found"})
+_PHOTO_CONFLICT_RESPONSE = _build_response(409, {"message": "Photo already recorded"})
+
+
+@lru_cache(maxsize=64)
+def _escape_family_id(family_id: str) -> str:
+    # A handful of family ids are escaped on every page view; per-photo fields
+    # and query values are mostly unique and go straight to html.escape.
+    return html.escape(family_id)
+
+
 def _content_type_to_extension(content_type: str) -> str:
     if not content_type:
         return ""
-    mapping = {
-        "image/jpeg": ".jpg",
-        "image/png": ".png",
-        "image/gif": ".gif",
-        "image/heic": ".heic",
-        "image/heif": ".heif",
-    }
-    return mapping.get(content_type.lower(), "")
+    # Well-formed headers are already lowercase; only fold case on a miss.
+    return _CONTENT_TYPE_EXTENSIONS.get(content_type) or _CONTENT_TYPE_EXTENSIONS.get(
+        content_type.lower(), ""
+    )
 
 
 def _parse_query_string(event: Dict[str, Any]) -> Dict[str, str]:
@@ -100,40 +228,54 @@ def _parse_query_string(event: Dict[str, Any]) -> Dict[str, str]:
         return {key: value for key, value in params.items() if value is not None}
     raw = event.get("rawQueryString")
     if raw:
-        return {key: value[0] for key, value in urllib.parse.parse_qs(raw).items()}
+        return _first_values(urllib.parse.parse_qsl(raw))
     return {}
 
 
+def _first_values(pairs: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+    values: Dict[str, str] = {}
+    for key, value in pairs:
+        values.setdefault(key, value)
+    return values
+
+
 def _parse_cookies(event: Dict[str, Any]) -> Dict[str, str]:
     cookie_jar: Dict[str, str] = {}
     header = None
     headers = event.get("headers") or {}
     if headers:
-        header = headers.get("cookie") or headers.get("Cookie")
+        header = headers.get("cookie")
     cookie_list = event.get("cookies") or []
     if header:
         cookie_list = list(cookie_list) + [header]
 
     for raw_cookie in cookie_list:
-        try:
-            parsed = SimpleCookie()
-            parsed.load(raw_cookie)
-        except (ValueError, KeyError):
-            continue
-        for key, morsel in parsed.items():
-            cookie_jar[key] = morsel.value
+        for piece in raw_cookie.split(";"):
+            key, separator, value = piece.strip().partition("=")
+            if not separator or not key:
+                continue
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            cookie_jar[key.rstrip()] = urllib.parse.unquote(value)
     return cookie_jar
 
 
+def _decode_base64_body(body: Any) -> bytes:
+    # binascii reads ASCII str bodies in place; base64.b64decode would first
+    # copy the whole encoded upload into a bytes object.
+    return binascii.a2b_base64(body)
+
+
 def _parse_form_data(event: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
     headers = event.get("headers") or {}
-    content_type = headers.get("content-type") or headers.get("Content-Type") or ""
+    content_type = headers.get("content-type") or ""
     body = event.get("body")
     if body is None:
         return {}, {}
 
     if event.get("isBase64Encoded"):
-        body_bytes = base64.b64decode(body)
+        body_bytes = _decode_base64_body(body)
     else:
         if isinstance(body, bytes):
             body_bytes = body
@@ -141,38 +283,93 @@ def _parse_form_data(event: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, D
             body_bytes = body.encode("utf-8")
 
     if content_type.startswith("application/x-www-form-urlencoded"):
-        parsed = urllib.parse.parse_qs(body_bytes.decode("utf-8"))
-        return {key: values[0] for key, values in parsed.items()}, {}
+        return _first_values(urllib.parse.parse_qsl(body_bytes.decode("utf-8"))), {}
 
     if content_type.startswith("multipart/form-data"):
-        parser = BytesParser(policy=EMAIL_POLICY)
-        message_bytes = b"Content-Type: " + content_type.encode("utf-8") + b"\r\n\r\n" + body_bytes
-        form_message = parser.parsebytes(message_bytes)
-        fields: Dict[str, str] = {}
-        files: Dict[str, Dict[str, Any]] = {}
-        for part in form_message.iter_parts():
-            if part.get_content_disposition() != "form-data":
-                continue
-            name = part.get_param("name", header="content-disposition")
-            if not name:
-                continue
-            filename = part.get_param("filename", header="content-disposition")
-            if filename:
-                files[name] = {
-                    "filename": filename,
-                    "content_type": part.get_content_type(),
-                    "data": part.get_payload(decode=True) or b"",
-                }
-            else:
-                fields[name] = part.get_content()
-        return fields, files
+        boundary = _parse_header_params(content_type)[1].get("boundary")
+        if not boundary:
+            return {}, {}
+        return _parse_multipart(body_bytes, boundary)
 
     return {}, {}
 
 
+def _parse_header_params(value: str) -> Tuple[str, Dict[str, str]]:
+    main_value, _, remainder = value.partition(";")
+    params: Dict[str, str] = {}
+    for match in _HEADER_PARAM_RE.finditer(";" + remainder):
+        param_value = match.group(2).strip()
+        if len(param_value) >= 2 and param_value[0] == param_value[-1] == '"':
+            param_value = param_value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+        params[match.group(1).lower()] = param_value
+    return main_value.strip().lower(), params
+
+
+def _malformed_multipart(reason: str) -> ValueError:
+    LOGGER.warning("Rejecting multipart body: %s", reason)
+    return ValueError(f"Malformed multipart form data: {reason}")
+
+
+def _parse_multipart(
+    body_bytes: bytes, boundary: str
+) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+    """Split a multipart/form-data body by scanning for boundary delimiters.
+
+    Only CRLF line endings are accepted, as RFC 7578 requires; anything else
+    raises ``ValueError`` instead of silently yielding empty form data.
+    """
+
+    delimiter = b"--" + boundary.encode("latin-1")
+    part_separator = b"\r\n" + delimiter
+    fields: Dict[str, str] = {}
+    files: Dict[str, Dict[str, Any]] = {}
+
+    position = body_bytes.find(delimiter)
+    if position == -1:
+        raise _malformed_multipart("no opening delimiter")
+    while position != -1:
+        part_start = position + len(delimiter)
+        if body_bytes.startswith(b"--", part_start):
+            break
+        if not body_bytes.startswith(b"\r\n", part_start):
+            raise _malformed_multipart("delimiter not followed by CRLF")
+        headers_end = body_bytes.find(b"\r\n\r\n", part_start)
+        if headers_end == -1:
+            raise _malformed_multipart("part headers not terminated by CRLF CRLF")
+        data_start = headers_end + 4
+        data_end = body_bytes.find(part_separator, data_start)
+        if data_end == -1:
+            raise _malformed_multipart("missing closing delimiter")
+        position = data_end + 2
+
+        part_headers: Dict[str, str] = {}
+        for line in body_bytes[part_start:headers_end].decode("utf-8", "replace").split("\r\n"):
+            name, separator, value = line.partition(":")
+            if separator:
+                part_headers[name.strip().lower()] = value.strip()
+
+        disposition, params = _parse_header_params(part_headers.get("content-disposition", ""))
+        name = params.get("name")
+        if disposition != "form-data" or not name:
+            continue
+
+        filename = params.get("filename")
+        if filename:
+            part_content_type = _parse_header_params(part_headers.get("content-type", ""))[0]
+            files[name] = {
+                "filename": filename,
+                "content_type": part_content_type or "text/plain",
+                "data": body_bytes[data_start:data_end],
+            }
+        else:
+            fields[name] = body_bytes[data_start:data_end].decode("utf-8", "replace")
+
+    return fields, files
+
+
 def _family_id_from_event(event: Dict[str, Any], form_fields: Optional[Dict[str, str]] = None) -> Optional[str]:
     headers = event.get("headers") or {}
-    family_id = headers.get("x-family-id") or headers.get("X-Family-Id")
+    family_id = headers.get("x-family-id")
     if family_id:
         return family_id
 
@@ -203,18 +400,23 @@ def _extract_family_id(event: Dict[str, Any], form_fields: Optional[Dict[str, st
     return _validate_family_id(family_id)
 
 
-def _base_path(event: Dict[str, Any], raw_path: str) -> str:
-    request_context = event.get("requestContext") or {}
-    stage = (request_context.get("stage") or "").strip()
+@lru_cache(maxsize=8)
+def _stage_prefixes(stage: str) -> Tuple[str, ...]:
+    """Return the stage prefixes a request path may carry, keyed on the stage only."""
+
     stage_candidates: List[str] = []
     if stage and stage != "$default":
         stage_candidates.append(stage)
     if STAGE_NAME:
         stage_candidates.append(STAGE_NAME)
 
-    for candidate in stage_candidates:
-        prefix = f"/{candidate}".rstrip("/")
-        if prefix and (raw_path == prefix or raw_path.startswith(prefix + "/")):
+    prefixes = (f"/{candidate}".rstrip("/") for candidate in stage_candidates)
+    return tuple(prefix for prefix in prefixes if prefix)
+
+
+def _base_path(stage: str, raw_path: str) -> str:
+    for prefix in _stage_prefixes(stage):
+        if raw_path == prefix or raw_path.startswith(prefix + "/"):
             return prefix
     return ""
 
@@ -235,17 +437,14 @@ def _append_query(path: str, query: str) -> str:
     return f"{path}{separator}{query}" if query else path
 
 
-def handler(event: Dict[str, Any], _context: Any) -> Dict[str, Any]:
-    LOGGER.debug("Received event: %s", json.dumps(event))
+def _resolve_path(raw_path: str, stage: str) -> Tuple[str, str]:
+    """Return the route path with any stage prefix removed, plus that prefix."""
 
-    request_context = event.get("requestContext") or {}
-    method = (request_context.get("http") or {}).get("method", "")
-    raw_path = event.get("rawPath", "/")
     if "?" in raw_path:
         raw_path = raw_path.split("?", 1)[0]
 
     path = (raw_path or "/").rstrip("/") or "/"
-    base_path = _base_path(event, path)
+    base_path = _base_path(stage, path)
     if base_path:
         normalized_base = base_path.rstrip("/")
         if path == normalized_base:
@@ -254,46 +453,59 @@ def handler(event: Dict[str, Any], _context: Any) -> Dict[str, Any]:
             trimmed = path[len(normalized_base):] or "/"
             path = trimmed
 
-    path = path.rstrip("/") or "/"
+    return path.rstrip("/") or "/", base_path
+
 
-    if method == "GET" and path == "/":
-        return _handle_home(event, base_path)
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    global _invocation_deadline
+    # Lambda serves one event at a time per process, so a module global is safe.
+    _invocation_deadline = (
+        time.monotonic() + context.get_remaining_time_in_millis() / 1000
+        if context is not None
+        else None
+    )
 
-    if method == "POST" and path == "/session":
-        return _handle_session(event, base_path)
+    if LOGGER.isEnabledFor(logging.DEBUG):
+        # Skip the body: multipart uploads can carry megabytes of base64.
+        LOGGER.debug(
+            "Received event: %s",
+            json.dumps({key: value for key, value in event.items() if key != "body"}),
+        )
 
-    if method == "POST" and path == "/session/logout":
-        return _handle_logout(event, base_path)
+    # Header names are case-insensitive; fold them once so helpers need a single lookup.
+    event["headers"] = {key.lower(): value for key, value in (event.get("headers") or {}).items()}
 
-    if method == "POST" and path == "/photos/form-upload":
-        return _handle_form_photo_upload(event, base_path)
+    request_context = event.get("requestContext") or {}
+    method = (request_context.get("http") or {}).get("method", "")
+    stage = (request_context.get("stage") or "").strip()
+    path, base_path = _resolve_path(event.get("rawPath", "/"), stage)
+
+    route = _PUBLIC_ROUTES.get((method, path))
+    if route:
+        return route(event, base_path)
 
     if method == "GET" and path.startswith("/photos/") and path.endswith("/content"):
         return _handle_photo_content(event, path, base_path)
 
-    if method == "GET" and path == "/health":
-        return _build_response(200, {"status": "ok"})
+    family_route = _FAMILY_ROUTES.get((method, path))
+    if not family_route:
+        return _NOT_FOUND_RESPONSE
 
     try:
         family_id = _extract_family_id(event)
     except PermissionError as exc:
         return _build_response(403, {"message": str(exc)})
 
-    if method == "GET" and path == "/photos":
-        return _list_photos(family_id)
-
-    if method == "POST" and path == "/photos/upload-url":
-        return _create_presigned_upload(family_id, event)
+    return family_route(family_id, event)
 
-    if method == "POST" and path == "/photos":
-        return _record_photo_metadata(family_id, event)
 
-    return _build_response(404, {"message": "Not Found"})
+def _handle_health(_event: Dict[str, Any], _base_path: str) -> Dict[str, Any]:
+    return _HEALTH_OK_RESPONSE
 
 
 def _cookie_attributes(event: Dict[str, Any]) -> str:
     headers = event.get("headers") or {}
-    proto = headers.get("x-forwarded-proto") or headers.get("X-Forwarded-Proto") or "http"
+    proto = headers.get("x-forwarded-proto") or "http"
     attributes = ["Path=/", "HttpOnly", "SameSite=Lax"]
     if proto.lower() == "https":
         attributes.append("Secure")
@@ -301,7 +513,12 @@ def _cookie_attributes(event: Dict[str, Any]) -> str:
 
 
 def _handle_session(event: Dict[str, Any], base_path: str) -> Dict[str, Any]:
-    form_fields, _ = _parse_form_data(event)
+    try:
+        form_fields, _ = _parse_form_data(event)
+    except ValueError:
+        LOGGER.warning("Rejected unreadable session form body")
+        html_body = _render_home_html(None, error=_MALFORMED_FORM_MESSAGE, base_path=base_path)
+        return _build_response(400, html_body, content_type=HTML_CONTENT_TYPE)
     family_id = (form_fields.get("family_id") or "").strip()
 
     try:
@@ -326,12 +543,12 @@ def _handle_logout(event: Dict[str, Any], base_path: str) -> Dict[str, Any]:
 
 def _handle_home(event: Dict[str, Any], base_path: str) -> Dict[str, Any]:
     query = _parse_query_string(event)
+    family_id = _family_id_from_event(event)
     status = query.get("status")
     message = None
     if status == "welcome":
-        family_id = _family_id_from_event(event)
         if family_id:
-            message = f"Signed in as {html.escape(family_id)}"
+            message = f"Signed in as {_escape_family_id(family_id)}"
     elif status == "uploaded":
         message = "Photo uploaded successfully"
     elif status == "goodbye":
@@ -343,7 +560,6 @@ def _handle_home(event: Dict[str, Any], base_path: str) -> Dict[str, Any]:
     if error:
         error = html.escape(error)
 
-    family_id = _family_id_from_event(event)
     photos: List[Dict[str, Any]] = []
     load_error = None
 
@@ -364,35 +580,60 @@ def _handle_home(event: Dict[str, Any], base_path: str) -> Dict[str, Any]:
     return _build_response(200, body, content_type=HTML_CONTENT_TYPE)
 
 
-def _render_home_html(
-    family_id: Optional[str],
-    *,
-    message: Optional[str] = None,
-    error: Optional[str] = None,
-    photos: Optional[List[Dict[str, Any]]] = None,
-    base_path: str = "",
-) -> str:
-    photos = photos or []
-
-    alerts: List[str] = []
-    if message:
-        alerts.append(f'<div class="alert alert-success">{message}</div>')
-    if error:
-        alerts.append(f'<div class="alert alert-error">{error}</div>')
+_HOME_PAGE_PREFIX = """<!DOCTYPE html>
+<html lang="en">
+  <head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>Family Cat Photos</title>
+    <style>
+      body { font-family: system-ui, sans-serif; margin: 0; padding: 0; background: #f7f7f7; color: #222; }
+      header { background: #3f51b5; color: #fff; padding: 1.5rem; text-align: center; }
+      main { max-width: 960px; margin: 2rem auto; padding: 0 1rem; }
+      .panel { background: #fff; padding: 1.5rem; border-radius: 0.75rem; box-shadow: 0 8px 24px rgba(0,0,0,0.08); margin-bottom: 1.5rem; }
+      label { display: block; margin-bottom: 0.75rem; font-weight: 600; }
+      input[type="text"], input[type="datetime-local"], input[type="file"], textarea { width: 100%; padding: 0.5rem; margin-top: 0.35rem; border-radius: 0.5rem; border: 1px solid #ccc; }
+      button { background: #3f51b5; color: #fff; border: none; border-radius: 0.5rem; padding: 0.75rem 1.5rem; cursor: pointer; }
+      button:hover { background: #303f9f; }
+      .gallery { display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 1.5rem; }
+      figure { margin: 0; background: #fafafa; padding: 1rem; border-radius: 0.75rem; box-shadow: inset 0 0 0 1px rgba(0,0,0,0.05); }
+      figure img { width: 100%; height: auto; border-radius: 0.5rem; object-fit: cover; }
+      figcaption { margin-top: 0.75rem; }
+      .alert { padding: 0.75rem 1rem; border-radius: 0.5rem; margin-bottom: 1rem; }
+      .alert-success { background: #e8f5e9; color: #256029; }
+      .alert-error { background: #ffebee; color: #c62828; }
+      .welcome { margin-bottom: 1rem; }
+      .empty { color: #666; }
+    </style>
+  </head>
+  <body>
+    <header>
+      <h1>Family Cat Photos</h1>
+      <p>Private space to share your favorite feline moments.</p>
+    </header>
+    """
+_HOME_PAGE_SUFFIX = """
+  </body>
+</html>"""
+
+_LOGIN_FORM_TEMPLATE = """
+        <section class="panel">
+          {alerts}
+          <h2>Sign in to see your family cats</h2>
+          <form method="POST" action="{login_action}">
+            <label>Family identifier
+              <input type="text" name="family_id" required autofocus>
+            </label>
+            <button type="submit">Continue</button>
+          </form>
+        </section>
+        """
 
-    if family_id:
-        welcome = f"<p class=\"welcome\">Viewing photos for <strong>{html.escape(family_id)}</strong></p>"
-        logout_action = _stage_path(base_path, "/session/logout")
-        logout_form = (
-            f"<form method=\"POST\" action=\"{logout_action}\">"
-            "<button type=\"submit\">Sign out</button>"
-            "</form>"
-        )
-        upload_form = f"""
+_UPLOAD_FORM_TEMPLATE = """
         <section class="panel">
           <h2>Upload a new cat photo</h2>
-          <form method="POST" action="{_stage_path(base_path, '/photos/form-upload')}" enctype="multipart/form-data">
-            <input type="hidden" name="family_id" value="{html.escape(family_id)}">
+          <form method="POST" action="{upload_action}" enctype="multipart/form-data">
+            <input type="hidden" name="family_id" value="{family_id}">
             <label>Photo file
               <input type="file" name="photo" accept="image/*" required>
             </label>
@@ -409,31 +650,17 @@ def _render_home_html(
           </form>
         </section>
         """
-        if photos:
-            gallery_items = []
-            for item in photos:
-                title = html.escape(item.get("title") or "Untitled cat photo")
-                description = html.escape(item.get("description") or "")
-                uploaded_at = html.escape(item.get("uploadedAt") or "")
-                content_url = _stage_path(
-                    base_path,
-                    f"/photos/{urllib.parse.quote(item['photoId'])}/content",
-                )
-                gallery_items.append(
-                    f"<figure>\n"
-                    f"  <img src=\"{content_url}\" alt=\"{title}\" loading=\"lazy\" referrerpolicy=\"no-referrer\">\n"
-                    f"  <figcaption>\n"
-                    f"    <strong>{title}</strong><br>\n"
-                    f"    <small>Uploaded at {uploaded_at}</small><br>\n"
-                    f"    <span>{description}</span>\n"
-                    f"  </figcaption>\n"
-                    f"</figure>"
-                )
-            gallery = "<section class=\"gallery\">" + "".join(gallery_items) + "</section>"
-        else:
-            gallery = "<p class=\"empty\">No cat photos yet. Upload your first one!</p>"
 
-        body = """
+_GALLERY_FIGURE_TEMPLATE = """<figure>
+  <img src="{content_url}" alt="{title}" loading="lazy" referrerpolicy="no-referrer">
+  <figcaption>
+    <strong>{title}</strong><br>
+    <small>Uploaded at {uploaded_at}</small><br>
+    <span>{description}</span>
+  </figcaption>
+</figure>"""
+
+_FAMILY_PAGE_TEMPLATE = """
         <main>
           {alerts}
           {welcome}
@@ -444,7 +671,54 @@ def _render_home_html(
             {gallery}
           </section>
         </main>
-        """.format(
+        """
+
+
+def _render_home_html(
+    family_id: Optional[str],
+    *,
+    message: Optional[str] = None,
+    error: Optional[str] = None,
+    photos: Optional[List[Dict[str, Any]]] = None,
+    base_path: str = "",
+) -> str:
+    photos = photos or []
+
+    alerts: List[str] = []
+    if message:
+        alerts.append(f'<div class="alert alert-success">{message}</div>')
+    if error:
+        alerts.append(f'<div class="alert alert-error">{error}</div>')
+
+    if family_id:
+        escaped_family_id = _escape_family_id(family_id)
+        welcome = f"<p class=\"welcome\">Viewing photos for <strong>{escaped_family_id}</strong></p>"
+        logout_action = _stage_path(base_path, "/session/logout")
+        logout_form = (
+            f"<form method=\"POST\" action=\"{logout_action}\">"
+            "<button type=\"submit\">Sign out</button>"
+            "</form>"
+        )
+        upload_form = _UPLOAD_FORM_TEMPLATE.format(
+            upload_action=_stage_path(base_path, "/photos/form-upload"),
+            family_id=escaped_family_id,
+        )
+        if photos:
+            content_prefix = _stage_path(base_path, "/photos/")
+            figures = "".join(
+                _GALLERY_FIGURE_TEMPLATE.format(
+                    content_url=f"{content_prefix}{urllib.parse.quote(item['photoId'])}/content",
+                    title=html.escape(item.get("title") or "Untitled cat photo"),
+                    description=html.escape(item.get("description") or ""),
+                    uploaded_at=html.escape(item.get("uploadedAt") or ""),
+                )
+                for item in photos
+            )
+            gallery = "<section class=\"gallery\">" + figures + "</section>"
+        else:
+            gallery = "<p class=\"empty\">No cat photos yet. Upload your first one!</p>"
+
+        body = _FAMILY_PAGE_TEMPLATE.format(
             alerts="".join(alerts),
             welcome=welcome,
             logout=logout_form,
@@ -452,61 +726,27 @@ def _render_home_html(
             gallery=gallery,
         )
     else:
-        login_action = _stage_path(base_path, "/session")
-        login_form = """
-        <section class="panel">
-          {alerts}
-          <h2>Sign in to see your family cats</h2>
-          <form method="POST" action="{login_action}">
-            <label>Family identifier
-              <input type="text" name="family_id" required autofocus>
-            </label>
-            <button type="submit">Continue</button>
-          </form>
-        </section>
-        """.format(alerts="".join(alerts), login_action=login_action)
+        login_form = _LOGIN_FORM_TEMPLATE.format(
+            alerts="".join(alerts),
+            login_action=_stage_path(base_path, "/session"),
+        )
         body = "<main>" + login_form + "</main>"
 
-    return """
-    <!DOCTYPE html>
-    <html lang="en">
-      <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <title>Family Cat Photos</title>
-        <style>
-          body {{ font-family: system-ui, sans-serif; margin: 0; padding: 0; background: #f7f7f7; color: #222; }}
-          header {{ background: #3f51b5; color: #fff; padding: 1.5rem; text-align: center; }}
-          main {{ max-width: 960px; margin: 2rem auto; padding: 0 1rem; }}
-          .panel {{ background: #fff; padding: 1.5rem; border-radius: 0.75rem; box-shadow: 0 8px 24px rgba(0,0,0,0.08); margin-bottom: 1.5rem; }}
-          label {{ display: block; margin-bottom: 0.75rem; font-weight: 600; }}
-          input[type="text"], input[type="datetime-local"], input[type="file"], textarea {{ width: 100%; padding: 0.5rem; margin-top: 0.35rem; border-radius: 0.5rem; border: 1px solid #ccc; }}
-          button {{ background: #3f51b5; color: #fff; border: none; border-radius: 0.5rem; padding: 0.75rem 1.5rem; cursor: pointer; }}
-          button:hover {{ background: #303f9f; }}
-          .gallery {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(220px, 1fr)); gap: 1.5rem; }}
-          figure {{ margin: 0; background: #fafafa; padding: 1rem; border-radius: 0.75rem; box-shadow: inset 0 0 0 1px rgba(0,0,0,0.05); }}
-          figure img {{ width: 100%; height: auto; border-radius: 0.5rem; object-fit: cover; }}
-          figcaption {{ margin-top: 0.75rem; }}
-          .alert {{ padding: 0.75rem 1rem; border-radius: 0.5rem; margin-bottom: 1rem; }}
-          .alert-success {{ background: #e8f5e9; color: #256029; }}
-          .alert-error {{ background: #ffebee; color: #c62828; }}
-          .welcome {{ margin-bottom: 1rem; }}
-          .empty {{ color: #666; }}
-        </style>
-      </head>
-      <body>
-        <header>
-          <h1>Family Cat Photos</h1>
-          <p>Private space to share your favorite feline moments.</p>
-        </header>
-        {body}
-      </body>
-    </html>
-    """.strip().format(body=body)
+    return _HOME_PAGE_PREFIX + body + _HOME_PAGE_SUFFIX
 
 
 def _handle_form_photo_upload(event: Dict[str, Any], base_path: str) -> Dict[str, Any]:
-    form_fields, files = _parse_form_data(event)
+    try:
+        form_fields, files = _parse_form_data(event)
+    except ValueError:
+        # Covers malformed multipart, base64 and UTF-8 alike; codec details stay in logs.
+        LOGGER.warning("Rejected unreadable form upload body")
+        try:
+            family_id: Optional[str] = _extract_family_id(event)
+        except PermissionError:
+            family_id = None
+        html_body = _render_home_html(family_id, error=_MALFORMED_FORM_MESSAGE, base_path=base_path)
+        return _build_response(400, html_body, content_type=HTML_CONTENT_TYPE)
 
     try:
         family_id = _extract_family_id(event, form_fields=form_fields)
@@ -532,7 +772,7 @@ def _handle_form_photo_upload(event: Dict[str, Any], base_path: str) -> Dict[str
     if not extension:
         extension = _content_type_to_extension("image/jpeg") or ".jpg"
 
-    photo_id = str(uuid.uuid4())
+    photo_id = secrets.token_hex(16)
     object_key = f"{family_id}/{photo_id}{extension}"
 
     try:
@@ -580,7 +820,7 @@ def _handle_form_photo_upload(event: Dict[str, Any], base_path: str) -> Dict[str
 def _handle_photo_content(event: Dict[str, Any], path: str, base_path: str) -> Dict[str, Any]:
     segments = [segment for segment in path.split("/") if segment]
     if len(segments) < 3:
-        return _build_response(404, {"message": "Not Found"})
+        return _NOT_FOUND_RESPONSE
     photo_id = urllib.parse.unquote(segments[1])
 
     try:
@@ -602,17 +842,15 @@ def _handle_photo_content(event: Dict[str, Any], path: str, base_path: str) -> D
         return _build_response(500, {"message": "Unable to fetch photo"})
 
     if not item:
-        return _build_response(404, {"message": "Photo not found"})
+        return _PHOTO_NOT_FOUND_RESPONSE
 
     object_key = item.get("ObjectKey", {}).get("S")
     if not object_key:
-        return _build_response(404, {"message": "Photo not found"})
+        return _PHOTO_NOT_FOUND_RESPONSE
 
     try:
-        download_url = s3_client.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={"Bucket": PHOTO_BUCKET_NAME, "Key": object_key},
-            ExpiresIn=UPLOAD_URL_TTL_SECONDS,
+        download_url = _presigned_download_url(
+            object_key, int(time.time()) // (UPLOAD_URL_TTL_SECONDS // 2)
         )
     except ClientError as exc:
         LOGGER.error("Failed to create download URL: %s", exc)
@@ -625,29 +863,47 @@ def _handle_photo_content(event: Dict[str, Any], path: str, base_path: str) -> D
     return _build_response(302, "", headers=headers, content_type="text/plain")
 
 
+@lru_cache(maxsize=1024)
+def _presigned_download_url(object_key: str, _window: int) -> str:
+    # The window rolls over at half the URL lifetime, so a cached URL is
+    # always handed out with at least half of its validity remaining.
+    return s3_client.generate_presigned_url(
+        ClientMethod="get_object",
+        Params={"Bucket": PHOTO_BUCKET_NAME, "Key": object_key},
+        ExpiresIn=UPLOAD_URL_TTL_SECONDS,
+    )
+
+
+def _project_photo_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    photo = {
+        "photoId": item["PhotoId"]["S"],
+        "objectKey": item["ObjectKey"]["S"],
+    }
+    for field, attribute in _OPTIONAL_PHOTO_ATTRIBUTES:
+        value = item.get(attribute)
+        photo[field] = value["S"] if value else None
+    return photo
+
+
 def _query_photos(family_id: str) -> List[Dict[str, Any]]:
-    response = dynamodb_client.query(
-        TableName=PHOTO_TABLE_NAME,
-        KeyConditionExpression="FamilyId = :family_id",
+    pages = dynamodb_client.get_paginator("query").paginate(
         ExpressionAttributeValues={":family_id": {"S": family_id}},
-        ScanIndexForward=False,
+        **_PHOTO_QUERY_KWARGS,
     )
-    items = []
-    for item in response.get("Items", []):
-        items.append(
-            {
-                "photoId": item["PhotoId"]["S"],
-                "objectKey": item["ObjectKey"]["S"],
-                "title": item.get("Title", {}).get("S"),
-                "description": item.get("Description", {}).get("S"),
-                "uploadedAt": item.get("UploadedAt", {}).get("S"),
-                "contentType": item.get("ContentType", {}).get("S"),
-            }
-        )
+    items: List[Dict[str, Any]] = []
+    for page in pages:
+        items.extend(map(_project_photo_item, page.get("Items", [])))
+        if (
+            page.get("LastEvaluatedKey")
+            and _invocation_deadline is not None
+            and time.monotonic() + _CALL_WORST_CASE_SECONDS > _invocation_deadline
+        ):
+            LOGGER.warning("Stopping photo query at %d items to stay within the timeout", len(items))
+            break
     return items
 
 
-def _list_photos(family_id: str) -> Dict[str, Any]:
+def _list_photos(family_id: str, _event: Dict[str, Any]) -> Dict[str, Any]:
     try:
         items = _query_photos(family_id)
     except ClientError as exc:
@@ -665,7 +921,7 @@ def _create_presigned_upload(family_id: str, event: Dict[str, Any]) -> Dict[str,
     content_type = payload.get("contentType", "image/jpeg")
     title = payload.get("title")
     extension = _content_type_to_extension(content_type)
-    photo_id = str(uuid.uuid4())
+    photo_id = secrets.token_hex(16)
     object_key = f"{family_id}/{photo_id}{extension}"
 
     try:
@@ -719,26 +975,101 @@ def _record_photo_metadata(family_id: str, event: Dict[str, Any]) -> Dict[str, A
     except PermissionError as exc:
         return _build_response(403, {"message": str(exc)})
     except ClientError as exc:
-        if exc.response["Error"].get("Code") == "ConditionalCheckFailedException":
-            return _build_response(409, {"message": "Photo already recorded"})
+        if exc.response.get("Error", {}).get("Code") == _CONDITIONAL_CHECK_FAILED:
+            return _PHOTO_CONFLICT_RESPONSE
         LOGGER.error("Failed to persist metadata: %s", exc)
         return _build_response(500, {"message": "Unable to save metadata"})
 
     return _build_response(201, result)
 
 
-def _persist_photo_metadata(
+def _record_photo_metadata_batch(family_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        payload = _extract_json_body(event)
+    except ValueError as exc:
+        return _build_response(400, {"message": str(exc)})
+
+    entries = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return _build_response(400, {"message": "Expected a non-empty items list"})
+    if len(entries) > PHOTO_BATCH_MAX_ITEMS:
+        return _build_response(
+            400,
+            {"message": "Too many items", "maxItems": PHOTO_BATCH_MAX_ITEMS},
+        )
+
+    required_fields = {"photoId", "objectKey"}
+    if not all(isinstance(entry, dict) and required_fields.issubset(entry) for entry in entries):
+        return _build_response(
+            400,
+            {"message": "Missing required fields", "required": sorted(required_fields)},
+        )
+
+    photo_ids = [str(entry["photoId"]) for entry in entries]
+    if len(set(photo_ids)) != len(photo_ids):
+        return _build_response(400, {"message": "Duplicate photoId in batch"})
+
+    uploaded_at = _utc_now_iso()
+    items = [
+        _build_photo_item(
+            family_id,
+            photo_id,
+            str(entry["objectKey"]),
+            uploaded_at=uploaded_at,
+            title=entry.get("title"),
+            description=entry.get("description"),
+            content_type=entry.get("contentType"),
+            taken_at=entry.get("takenAt"),
+        )
+        for photo_id, entry in zip(photo_ids, entries)
+    ]
+
+    try:
+        _persist_photo_items(items)
+    except ClientError as exc:
+        conflicts = _conditional_check_conflicts(exc, photo_ids)
+        if conflicts:
+            return _build_response(
+                409,
+                {"message": "Photo already recorded", "conflicts": conflicts},
+            )
+        LOGGER.error("Failed to persist metadata batch: %s", exc)
+        return _build_response(500, {"message": "Unable to save metadata"})
+
+    results = [
+        {"photoId": photo_id, "objectKey": str(entry["objectKey"])}
+        for photo_id, entry in zip(photo_ids, entries)
+    ]
+    return _build_response(201, {"items": results})
+
+
+def _utc_now_iso() -> str:
+    """Format the current UTC time like ``datetime.isoformat`` with microseconds."""
+
+    seconds, nanoseconds = divmod(time.time_ns(), 1_000_000_000)
+    now = time.gmtime(seconds)
+    return "%04d-%02d-%02dT%02d:%02d:%02d.%06d+00:00" % (
+        now.tm_year,
+        now.tm_mon,
+        now.tm_mday,
+        now.tm_hour,
+        now.tm_min,
+        now.tm_sec,
+        nanoseconds // 1000,
+    )
+
+
+def _build_photo_item(
     family_id: str,
     photo_id: str,
     object_key: str,
     *,
+    uploaded_at: str,
     title: Optional[str] = None,
     description: Optional[str] = None,
     content_type: Optional[str] = None,
     taken_at: Optional[str] = None,
-) -> Dict[str, str]:
-    uploaded_at = datetime.now(timezone.utc).isoformat()
-
+) -> Dict[str, Dict[str, str]]:
     item = {
         "FamilyId": {"S": family_id},
         "PhotoId": {"S": photo_id},
@@ -755,27 +1086,83 @@ def _persist_photo_metadata(
     if taken_at:
         item["TakenAt"] = {"S": str(taken_at)}
 
-    dynamodb_client.put_item(
-        TableName=PHOTO_TABLE_NAME,
-        Item=item,
-        ConditionExpression="attribute_not_exists(PhotoId)",
+    return item
+
+
+def _persist_photo_metadata(
+    family_id: str,
+    photo_id: str,
+    object_key: str,
+    *,
+    title: Optional[str] = None,
+    description: Optional[str] = None,
+    content_type: Optional[str] = None,
+    taken_at: Optional[str] = None,
+) -> Dict[str, str]:
+    item = _build_photo_item(
+        family_id,
+        photo_id,
+        object_key,
+        uploaded_at=_utc_now_iso(),
+        title=title,
+        description=description,
+        content_type=content_type,
+        taken_at=taken_at,
     )
 
+    dynamodb_client.put_item(Item=item, **_PUT_PHOTO_KWARGS)
+
     return {"photoId": photo_id, "objectKey": object_key}
 
 
+def _persist_photo_items(items: List[Dict[str, Dict[str, str]]]) -> None:
+    """Write all items in one transaction; none are written if any photo id exists."""
+
+    dynamodb_client.transact_write_items(
+        TransactItems=[{"Put": {"Item": item, **_PUT_PHOTO_KWARGS}} for item in items]
+    )
+
+
+def _conditional_check_conflicts(exc: ClientError, photo_ids: List[str]) -> List[str]:
+    if exc.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+        return []
+    reasons = exc.response.get("CancellationReasons") or []
+    return [
+        photo_id
+        for photo_id, reason in zip(photo_ids, reasons)
+        if reason.get("Code") == "ConditionalCheckFailed"
+    ]
+
+
 def _extract_json_body(event: Dict[str, Any]) -> Dict[str, Any]:
     raw_body = event.get("body")
     if not raw_body:
         return {}
 
-    if event.get("isBase64Encoded"):
-        raw_body = base64.b64decode(raw_body)
-
     try:
-        if isinstance(raw_body, bytes):
-            raw_body = raw_body.decode("utf-8")
+        if event.get("isBase64Encoded"):
+            raw_body = _decode_base64_body(raw_body)
+        # json.loads accepts bytes directly, so decoded payloads skip a str copy.
         return json.loads(raw_body)
-    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+    except (binascii.Error, json.JSONDecodeError, UnicodeDecodeError) as exc:
         LOGGER.warning("Invalid JSON payload: %s", exc)
         raise ValueError("Invalid JSON body") from exc
+
+
+# Routes that resolve the family id themselves (or need none), keyed by
+# (method, path) after stage prefixes are stripped.
+_PUBLIC_ROUTES: Dict[Tuple[str, str], Callable[[Dict[str, Any], str], Dict[str, Any]]] = {
+    ("GET", "/"): _handle_home,
+    ("GET", "/health"): _handle_health,
+    ("POST", "/session"): _handle_session,
+    ("POST", "/session/logout"): _handle_logout,
+    ("POST", "/photos/form-upload"): _handle_form_photo_upload,
+}
+
+# Routes that require a validated family id, called as route(family_id, event).
+_FAMILY_ROUTES: Dict[Tuple[str, str], Callable[[str, Dict[str, Any]], Dict[str, Any]]] = {
+    ("GET", "/photos"): _list_photos,
+    ("POST", "/photos"): _record_photo_metadata,
+    ("POST", "/photos/batch"): _record_photo_metadata_batch,
+    ("POST", "/photos/upload-url"): _create_presigned_upload,
+}
@@ -1,4 +1,6 @@
+import base64
 import json
+import logging
 import os
 import sys
 import urllib.parse
@@ -6,6 +8,7 @@ from pathlib import Path
 from typing import Dict, Iterable, Optional
 
 import pytest
+from botocore.exceptions import EndpointConnectionError
 from botocore.stub import ANY, Stubber
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -25,9 +28,16 @@ from handlers import photos  # noqa: E402  pylint: disable=wrong-import-position
 @pytest.fixture(autouse=True)
 def reset_allowed_family_ids(monkeypatch):
     monkeypatch.setenv("ALLOWED_FAMILY_IDS", "family-123")
-    photos.ALLOWED_FAMILY_IDS = {"family-123"}
+    photos.ALLOWED_FAMILY_IDS = frozenset({"family-123"})
     yield
-    photos.ALLOWED_FAMILY_IDS = {"family-123"}
+    photos.ALLOWED_FAMILY_IDS = frozenset({"family-123"})
+
+
+@pytest.fixture(autouse=True)
+def clear_presign_cache():
+    photos._presigned_download_url.cache_clear()
+    yield
+    photos._presigned_download_url.cache_clear()
 
 
 def make_event(
@@ -72,6 +82,76 @@ def test_requires_family_id_header():
     assert "message" in json.loads(response["body"])
 
 
+def test_family_id_header_is_case_insensitive():
+    event = make_event("GET", "/photos", headers={"X-Family-Id": "family-123"})
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_response("query", {"Items": []}, None)
+        response = photos.handler(event, None)
+
+    assert response["statusCode"] == 200
+
+
+def test_health_check_needs_no_family_id():
+    response = photos.handler(make_event("GET", "/dev/health", stage="dev"), None)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {"status": "ok"}
+
+
+def test_unknown_route_returns_not_found():
+    event = make_event("DELETE", "/photos", headers={"x-family-id": "family-123"})
+    response = photos.handler(event, None)
+
+    assert response["statusCode"] == 404
+
+
+def test_resolve_log_level_falls_back_to_info():
+    assert photos._resolve_log_level("debug") == logging.DEBUG
+    assert photos._resolve_log_level("verbose") == logging.INFO
+
+
+def test_resolve_path_only_caches_stage_prefixes():
+    photos._stage_prefixes.cache_clear()
+    for index in range(200):
+        path, base_path = photos._resolve_path(f"/dev/photos/{index}/content", "dev")
+        assert path == f"/photos/{index}/content"
+        assert base_path == "/dev"
+
+    assert photos._resolve_path("/dev/", "dev") == ("/", "/dev")
+    assert photos._stage_prefixes.cache_info().currsize == 1
+
+
+def test_warm_clients_uses_request_clients_and_stops_on_network_error(monkeypatch):
+    calls = []
+
+    def failing_describe_table(**kwargs):
+        calls.append("describe_table")
+        raise EndpointConnectionError(endpoint_url="https://dynamodb")
+
+    monkeypatch.setattr(photos.dynamodb_client, "describe_table", failing_describe_table)
+    monkeypatch.setattr(
+        photos.s3_client, "head_bucket", lambda **kwargs: calls.append("head_bucket")
+    )
+
+    photos._warm_clients()
+
+    assert calls == ["describe_table"]
+
+
+def test_warm_clients_continues_after_client_error(monkeypatch):
+    calls = []
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_client_error("describe_table", service_error_code="AccessDeniedException")
+        monkeypatch.setattr(
+            photos.s3_client, "head_bucket", lambda **kwargs: calls.append(kwargs["Bucket"])
+        )
+        photos._warm_clients()
+
+    assert calls == [os.environ["PHOTO_BUCKET_NAME"]]
+
+
 def test_generate_presigned_upload(monkeypatch):
     event = make_event(
         "POST",
@@ -126,6 +206,124 @@ def test_record_photo_metadata():
     assert body["photoId"] == "abc-123"
 
 
+def test_utc_now_iso_matches_datetime_format(monkeypatch):
+    monkeypatch.setattr(photos.time, "time_ns", lambda: 1_704_067_200_000_123_456)
+
+    assert photos._utc_now_iso() == "2024-01-01T00:00:00.000123+00:00"
+
+
+def test_record_photo_metadata_conflict():
+    event = make_event(
+        "POST",
+        "/photos",
+        headers={"x-family-id": "family-123"},
+        body={"photoId": "abc-123", "objectKey": "family-123/abc-123.jpg"},
+    )
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_client_error(
+            "put_item",
+            service_error_code="ConditionalCheckFailedException",
+            http_status_code=400,
+        )
+        response = photos.handler(event, None)
+
+    assert response["statusCode"] == 409
+    assert json.loads(response["body"]) == {"message": "Photo already recorded"}
+
+
+def make_batch_event(entries):
+    return make_event(
+        "POST",
+        "/photos/batch",
+        headers={"x-family-id": "family-123"},
+        body={"items": entries},
+    )
+
+
+def test_record_photo_metadata_batch_writes_one_transaction():
+    entries = [
+        {"photoId": f"photo-{index}", "objectKey": f"family-123/photo-{index}.jpg"}
+        for index in range(30)
+    ]
+
+    put = {
+        "Put": {
+            "TableName": os.environ["PHOTO_TABLE_NAME"],
+            "Item": ANY,
+            "ConditionExpression": "attribute_not_exists(PhotoId)",
+        }
+    }
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_response(
+            "transact_write_items",
+            {},
+            {"TransactItems": [put] * len(entries)},
+        )
+        response = photos.handler(make_batch_event(entries), None)
+        stubber.assert_no_pending_responses()
+
+    assert response["statusCode"] == 201
+    body = json.loads(response["body"])
+    assert [item["photoId"] for item in body["items"]] == [entry["photoId"] for entry in entries]
+
+
+def test_record_photo_metadata_batch_reports_existing_photos():
+    entries = [
+        {"photoId": "new", "objectKey": "family-123/new.jpg"},
+        {"photoId": "existing", "objectKey": "family-123/existing.jpg"},
+    ]
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_client_error(
+            "transact_write_items",
+            service_error_code="TransactionCanceledException",
+            http_status_code=400,
+            modeled_fields={
+                "CancellationReasons": [
+                    {"Code": "None"},
+                    {"Code": "ConditionalCheckFailed"},
+                ]
+            },
+        )
+        response = photos.handler(make_batch_event(entries), None)
+
+    assert response["statusCode"] == 409
+    assert json.loads(response["body"])["conflicts"] == ["existing"]
+
+
+def test_record_photo_metadata_batch_rejects_array_body():
+    event = make_event(
+        "POST",
+        "/photos/batch",
+        headers={"x-family-id": "family-123"},
+        body=json.dumps([1, 2]),
+    )
+
+    response = photos.handler(event, None)
+
+    assert response["statusCode"] == 400
+
+
+def test_record_photo_metadata_batch_rejects_duplicates():
+    event = make_event(
+        "POST",
+        "/photos/batch",
+        headers={"x-family-id": "family-123"},
+        body={
+            "items": [
+                {"photoId": "abc", "objectKey": "family-123/abc.jpg"},
+                {"photoId": "abc", "objectKey": "family-123/abc-2.jpg"},
+            ]
+        },
+    )
+
+    response = photos.handler(event, None)
+
+    assert response["statusCode"] == 400
+
+
 def test_list_photos_returns_items():
     event = make_event(
         "GET",
@@ -137,7 +335,10 @@ def test_list_photos_returns_items():
         "TableName": os.environ["PHOTO_TABLE_NAME"],
         "KeyConditionExpression": "FamilyId = :family_id",
         "ExpressionAttributeValues": {":family_id": {"S": "family-123"}},
+        "ProjectionExpression": ANY,
+        "ExpressionAttributeNames": ANY,
         "ScanIndexForward": False,
+        "Limit": photos.PHOTO_QUERY_PAGE_SIZE,
     }
 
     response_items = {
@@ -161,6 +362,62 @@ def test_list_photos_returns_items():
     assert body["items"][0]["objectKey"] == "family-123/abc.jpg"
 
 
+def test_list_photos_follows_pagination():
+    def page(photo_id):
+        return {
+            "PhotoId": {"S": photo_id},
+            "ObjectKey": {"S": f"family-123/{photo_id}.jpg"},
+        }
+
+    last_key = {"FamilyId": {"S": "family-123"}, "PhotoId": {"S": "abc"}}
+    base_params = {
+        "TableName": os.environ["PHOTO_TABLE_NAME"],
+        "KeyConditionExpression": "FamilyId = :family_id",
+        "ExpressionAttributeValues": {":family_id": {"S": "family-123"}},
+        "ProjectionExpression": ANY,
+        "ExpressionAttributeNames": ANY,
+        "ScanIndexForward": False,
+        "Limit": photos.PHOTO_QUERY_PAGE_SIZE,
+    }
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_response(
+            "query",
+            {"Items": [page("abc")], "LastEvaluatedKey": last_key},
+            base_params,
+        )
+        stubber.add_response(
+            "query",
+            {"Items": [page("def")]},
+            {**base_params, "ExclusiveStartKey": last_key},
+        )
+        items = photos._query_photos("family-123")
+        stubber.assert_no_pending_responses()
+
+    assert [item["photoId"] for item in items] == ["abc", "def"]
+
+
+def test_list_photos_stops_paginating_near_deadline():
+    class FakeContext:
+        def get_remaining_time_in_millis(self):
+            return 5_000
+
+    last_key = {"FamilyId": {"S": "family-123"}, "PhotoId": {"S": "abc"}}
+    page = {
+        "Items": [{"PhotoId": {"S": "abc"}, "ObjectKey": {"S": "family-123/abc.jpg"}}],
+        "LastEvaluatedKey": last_key,
+    }
+    event = make_event("GET", "/photos", headers={"x-family-id": "family-123"})
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_response("query", page, None)
+        response = photos.handler(event, FakeContext())
+        stubber.assert_no_pending_responses()
+
+    assert response["statusCode"] == 200
+    assert [item["photoId"] for item in json.loads(response["body"])["items"]] == ["abc"]
+
+
 def test_home_page_prompts_for_family_identifier():
     event = make_event("GET", "/")
     response = photos.handler(event, None)
@@ -171,6 +428,29 @@ def test_home_page_prompts_for_family_identifier():
     assert 'action="/session"' in response["body"]
 
 
+def test_home_page_renders_gallery_for_signed_in_family():
+    event = make_event("GET", "/dev", stage="dev", cookies=["family_id=family-123"])
+    response_items = {
+        "Items": [
+            {
+                "PhotoId": {"S": "abc 1"},
+                "ObjectKey": {"S": "family-123/abc.jpg"},
+                "Title": {"S": "<Tom>"},
+                "UploadedAt": {"S": "2024-01-01T00:00:00Z"},
+            }
+        ]
+    }
+
+    with Stubber(photos.dynamodb_client) as stubber:
+        stubber.add_response("query", response_items, None)
+        response = photos.handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert 'src="/dev/photos/abc%201/content"' in response["body"]
+    assert "<strong>&lt;Tom&gt;</strong>" in response["body"]
+    assert 'action="/dev/photos/form-upload"' in response["body"]
+
+
 def test_home_page_handles_stage_prefix():
     event = make_event("GET", "/dev", stage="dev")
     response = photos.handler(event, None)
@@ -263,3 +543,170 @@ def test_photo_content_redirects_to_presigned_url(monkeypatch):
 
     assert response["statusCode"] == 302
     assert response["headers"]["Location"] == "https://example.com/download"
+
+
+def make_multipart_body(boundary: str, fields: Dict[str, str], files: Dict[str, tuple]) -> bytes:
+    chunks = []
+    for name, value in fields.items():
+        chunks.append(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n".encode("utf-8")
+        )
+    for name, (filename, content_type, data) in files.items():
+        chunks.append(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8")
+            + data
+            + b"\r\n"
+        )
+    chunks.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(chunks)
+
+
+def test_parse_multipart_form_data():
+    boundary = "----catboundary"
+    photo_bytes = b"\x89PNG\r\n\r\n--not-a-boundary\r\n\x00"
+    body = make_multipart_body(
+        boundary,
+        {"family_id": "family-123", "title": "Whiskers; the brave"},
+        {"photo": ("cat; one.png", "image/png", photo_bytes)},
+    )
+    event = make_event(
+        "POST",
+        "/photos/form-upload",
+        headers={"content-type": f'multipart/form-data; boundary="{boundary}"'},
+        body=base64.b64encode(body).decode("ascii"),
+        is_base64=True,
+    )
+
+    fields, files = photos._parse_form_data(event)
+
+    assert fields == {"family_id": "family-123", "title": "Whiskers; the brave"}
+    assert files["photo"]["filename"] == "cat; one.png"
+    assert files["photo"]["content_type"] == "image/png"
+    assert files["photo"]["data"] == photo_bytes
+
+
+def test_form_photo_upload_rejects_bare_lf_multipart():
+    boundary = "catboundary"
+    body = make_multipart_body(
+        boundary,
+        {"family_id": "family-123"},
+        {"photo": ("mittens.jpg", "image/jpeg", b"jpegdata")},
+    ).replace(b"\r\n", b"\n")
+    event = make_event(
+        "POST",
+        "/photos/form-upload",
+        headers={"content-type": f"multipart/form-data; boundary={boundary}"},
+        body=base64.b64encode(body).decode("ascii"),
+        is_base64=True,
+        cookies=["family_id=family-123"],
+    )
+
+    with pytest.raises(ValueError):
+        photos._parse_form_data(event)
+
+    response = photos.handler(event, None)
+
+    assert response["statusCode"] == 400
+    assert "Malformed form data" in response["body"]
+    assert "Please choose an image" not in response["body"]
+
+
+@pytest.mark.parametrize("body", [b"garbage", b""])
+def test_parse_multipart_requires_opening_delimiter(body):
+    with pytest.raises(ValueError):
+        photos._parse_multipart(body, "catboundary")
+
+
+def test_session_hides_decoder_errors():
+    event = make_event(
+        "POST",
+        "/session",
+        headers={"content-type": "application/x-www-form-urlencoded"},
+        body=base64.b64encode(b"family_id=\xff\xfe").decode("ascii"),
+        is_base64=True,
+    )
+
+    response = photos.handler(event, None)
+
+    assert response["statusCode"] == 400
+    assert "Malformed form data" in response["body"]
+    assert "codec" not in response["body"]
+
+
+def test_form_photo_upload_stores_object_and_metadata():
+    boundary = "catboundary"
+    body = make_multipart_body(
+        boundary,
+        {"family_id": "family-123", "title": "Mittens"},
+        {"photo": ("mittens.jpg", "image/jpeg", b"\xff\xd8\xff\xe0jpegdata")},
+    )
+    event = make_event(
+        "POST",
+        "/photos/form-upload",
+        headers={"content-type": f"multipart/form-data; boundary={boundary}"},
+        body=base64.b64encode(body).decode("ascii"),
+        is_base64=True,
+    )
+
+    with Stubber(photos.s3_client) as s3_stub, Stubber(photos.dynamodb_client) as dynamo_stub:
+        s3_stub.add_response(
+            "put_object",
+            {},
+            {
+                "Bucket": os.environ["PHOTO_BUCKET_NAME"],
+                "Key": ANY,
+                "Body": b"\xff\xd8\xff\xe0jpegdata",
+                "ContentType": "image/jpeg",
+            },
+        )
+        dynamo_stub.add_response(
+            "put_item",
+            {},
+            {
+                "TableName": os.environ["PHOTO_TABLE_NAME"],
+                "Item": ANY,
+                "ConditionExpression": "attribute_not_exists(PhotoId)",
+            },
+        )
+        response = photos.handler(event, None)
+
+    assert response["statusCode"] == 303
+    assert response["headers"]["Location"] == "/?status=uploaded"
+
+
+def test_photo_content_reuses_presigned_url(monkeypatch):
+    calls = []
+
+    def fake_presign(**kwargs):
+        calls.append(kwargs)
+        return f"https://example.com/download/{len(calls)}"
+
+    monkeypatch.setattr(photos.s3_client, "generate_presigned_url", fake_presign)
+
+    first = photos._presigned_download_url("family-123/abc.jpg", 1)
+    second = photos._presigned_download_url("family-123/abc.jpg", 1)
+    rolled = photos._presigned_download_url("family-123/abc.jpg", 2)
+
+    assert first == second == "https://example.com/download/1"
+    assert rolled == "https://example.com/download/2"
+    assert len(calls) == 2
+
+
+def test_parse_cookies_reads_header_and_cookie_list():
+    event = make_event(
+        "GET",
+        "/",
+        headers={"cookie": 'theme="dark"; family_id=family%20one'},
+        cookies=["session=abc", "malformed"],
+    )
+
+    cookies = photos._parse_cookies(event)
+
+    assert cookies["family_id"] == "family one"
+    assert cookies["theme"] == "dark"
+    assert cookies["session"] == "abc"
+    assert "malformed" not in cookies